@@ -2,8 +2,250 @@ import argparse
 from music21 import *
 import os
 import random
+import time
 from mapping import *
 from rhythm import generate_bird_rhythm
+from telemetry import TelemetrySink
+
+# Flats-only keys accepted by -k and rendered by -mk
+KEYS = ['A', 'Bb', 'B', 'C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab']
+
+# File extension written for each output type in multi-key mode
+OUTPUT_EXTENSIONS = {'midi': 'mid', 'musicxml': 'musicxml', 'text': 'txt'}
+
+chordTypes = {
+    'tonic': [
+        'vi', 'vi7', 'iii', 'iii7', 'I[add6]', 'I', 'I[add9]', 'Imaj7'
+    ],
+    'subdominant': [
+        'ii7', 'IV[add9]', 'IV', 'IVmaj7', 'ii'
+    ],
+    'dominant': [
+        'V7#5', 'V7', 'vii°', 'V', 'vii°7', 'V7/iii', 'V[add6]'
+    ],
+    'Rest': ['Rest']
+}
+
+rewardMap = {
+    ('tonic', 'tonic'): 1,
+    ('tonic', 'subdominant'): 6,
+    ('tonic', 'dominant'): 3,
+    ('subdominant', 'tonic'): 2,
+    ('subdominant', 'subdominant'): 4,
+    ('subdominant', 'dominant'): 4,
+    ('dominant', 'tonic'): 8,
+    ('dominant', 'subdominant'): 0,
+    ('dominant', 'dominant'): 2
+}
+
+# DNA bases
+BASES = ['a', 't', 'g', 'c']
+
+chord2Function = {c: fun for fun, cL in chordTypes.items() for c in cL}
+
+# Genetic Algorithm Hyperparameter defaults
+POPULATION_SIZE = 20
+GENERATIONS = 50
+MUTATION_RATE = 0.01
+CROSSOVER_RATE = 0.7
+ELITES = 2
+PARENTS = 10
+
+def create_music(DNASeq, k = key.Key('C'), rs = 42):
+    ## Commenting out irrelevant argparse stuff
+    random.seed = rs
+    # k = key.Key('C')
+
+    # Set up the score
+    # score = stream.Score()
+    chords = stream.Part()
+    chords.append(clef.BassClef())
+    melody = stream.Part()
+    melody.append(clef.TrebleClef())
+
+    # Add time signature and key information to the score
+    time_signature = meter.TimeSignature('4/4')
+    chords.append(time_signature)
+    melody.append(time_signature)
+    chords.append(k)
+    melody.append(k)
+
+    nucleotides = ''
+
+    ##### GET NUCLEOTIDES FROM INPUT
+    for char in DNASeq:
+        nucleotides += char
+
+
+    # Add chords to the first part object
+    key_list = []
+    curr_codon = ''
+    roman_chords = []
+    for n in nucleotides:
+        # Transcription
+        if n.lower() == 't':
+            n = 'u'
+        curr_codon += n.lower()
+        # If codon is size 3, translate into amino acid
+        if len(curr_codon) % 3 == 0:
+            # Translation
+            amino_acid = get_mapping_output(TRANSLATION, curr_codon.lower())
+            curr_chord = get_mapping_output(AMINO_ACID_TO_CHORD, amino_acid, chords, k, key_list)
+            roman_chords.append(curr_chord)
+            # get_mapping_output(AMINO_ACID_TO_CHORD, 'R', chords, k, key_list)
+            curr_codon = ''
+
+    # Calculate the time in quarter notes occupied by the chords
+    chord_length = 0
+    for chord in chords.notes:
+        chord_length += chord.duration.quarterLength
+
+    chords = chords.transpose(-12)
+
+    flag = False
+    current_chord_idx = 0
+    melody_length = 0
+    measure_pos = 0
+    rhythm_idx = 0
+
+    rhythmList = generate_bird_rhythm(chord_length)
+    rhythmList = [r for r in rhythmList if r > 0]
+
+    if sum(rhythmList) < chord_length:
+        rhythmList.append(chord_length - sum(rhythmList))
+
+    # Add a melody based on the DNA sequence and shaped by the protein-based chord sequence.
+    while not flag:
+        # Continue while the melody is not longer than the chords
+        if melody_length >= (chord_length-1e-4):
+            flag = True
+            break
+        # Iterate through the pitches in the DNA
+        for n in nucleotides:
+            # print(current_chord_idx, melody_length, measure_pos, rhythm_idx, rhythmList[rhythm_idx])
+            # Figure out chord tone using nucleotide
+            i = get_mapping_output(NUCLEOTIDE_TO_INDEX, n.lower())
+            # Get current chord
+            curr_chord = chords.notes[current_chord_idx]
+
+            # TODO: Replace this part with the generative model
+            # Pick a note length randomly
+            quarter_length = rhythmList[rhythm_idx] # random.choices([0.25, 0.5, 1], weights=[.1, .5, .4])[0]
+
+            # Add note to the melody
+            melody.append(note.Note(curr_chord.pitches[i % len(curr_chord.notes)], quarterLength=quarter_length).transpose(12))
+
+            # Calculate location in the score and measure
+            measure_pos += quarter_length
+            melody_length += quarter_length
+            rhythm_idx += 1
+            if melody_length >= (chord_length-1e-4):
+                flag = True
+                break
+            if measure_pos >= 4:
+                current_chord_idx += 1
+                measure_pos -= 4
+
+    return melody, roman_chords
+
+def reward(melody, chords, k):
+    count = 0
+    # melody smoothness evaluation
+    pastNote = None
+    for n in melody:
+        if not isinstance(n, note.Note): continue
+        if pastNote is None: pastNote = n.pitch.midi
+        else:
+            count += 2 * (1 / (1 + abs(n.pitch.midi - pastNote)))
+            if n.pitch.midi == pastNote: count -= 2
+            pastNote = n.pitch.midi
+
+    if n.pitch.midi in [i+k.pitches[0].midi for i in [0,4,7,12]]: count += 20
+
+    # chord progression evaluation
+    pastChord = None
+    for c in chords:
+        if pastChord is None and c != 'Rest': pastChord = c
+        else:
+            if 'Rest' == c: continue
+            count += rewardMap[(chord2Function[pastChord], chord2Function[c])]
+            pastChord = c
+    if chord2Function[c] == 'tonic': count += 20
+
+
+    return count
+
+# Helper: mutate a DNA string
+def mutate(dna, mutation_rate=MUTATION_RATE):
+    dna = list(dna)
+    for i in range(len(dna)):
+        if random.random() < mutation_rate:
+            dna[i] = random.choice(BASES)
+    return ''.join(dna)
+
+# Helper: crossover two parents
+def crossover(parent1, parent2, crossover_rate=CROSSOVER_RATE):
+    if random.random() > crossover_rate:
+        return parent1, parent2
+    point = random.randint(1, len(parent1) - 1)
+    child1 = parent1[:point] + parent2[point:]
+    child2 = parent2[:point] + parent1[point:]
+    return child1, child2
+
+# Helper: evaluate fitness
+def fitness(dna, k, rs):
+    melody, chords = create_music(dna, k, rs)
+    return reward(melody, chords, k)
+
+# Helper: mutated copies of the original sequence, which is kept as the first member
+def initial_population(initial_dna, population_size=POPULATION_SIZE, mutation_rate=MUTATION_RATE):
+    population = [mutate(initial_dna, mutation_rate) for _ in range(population_size)]
+    population[0] = initial_dna  # include the original sequence
+    return population
+
+# Helper: run the GA on an existing population, so a run can be paused and resumed
+def evolve_population(population, generations, k = key.Key('C'), rs = 42, mutation_rate=MUTATION_RATE,
+                      crossover_rate=CROSSOVER_RATE, elites=ELITES, parents=PARENTS, telemetry = None,
+                      start_gen = 0, verbose = True):
+    population_size = len(population)
+    best_scores = []
+    for gen in range(start_gen, start_gen + generations):
+        eval_start = time.perf_counter()
+        scored = [(dna, fitness(dna, k, rs)) for dna in population]
+        eval_seconds = time.perf_counter() - eval_start
+        scored.sort(key=lambda x: x[1], reverse=True)  # highest reward first
+
+        if verbose:
+            print(f"Generation {gen+1}: Best score = {scored[0][1]}")
+        if telemetry is not None:
+            telemetry.record(gen+1, [score for _, score in scored], population, len(population), eval_seconds)
+
+        best_scores.append(scored[0][1])
+        # Elitism: keep the top few
+        new_population = [dna for dna, _ in scored[:elites]]
+
+        # Create next generation
+        while len(new_population) < population_size:
+            parent1, parent2 = random.choices(scored[:parents], k=2)  # select from the top parents
+            child1, child2 = crossover(parent1[0], parent2[0], crossover_rate)
+            new_population.extend([mutate(child1, mutation_rate), mutate(child2, mutation_rate)])
+
+        population = new_population[:population_size]  # trim if overfilled
+
+    return population, best_scores
+
+# Genetic Algorithm
+def evolve_music(initial_dna, generations=GENERATIONS, k = key.Key('C'), rs = 42, telemetry = None,
+                 population_size=POPULATION_SIZE, mutation_rate=MUTATION_RATE, crossover_rate=CROSSOVER_RATE,
+                 elites=ELITES, parents=PARENTS):
+    population = initial_population(initial_dna, population_size, mutation_rate)
+    population, best_scores = evolve_population(population, generations, k, rs, mutation_rate, crossover_rate,
+                                                elites, parents, telemetry)
+
+    # Return the best DNA and its melody/chords
+    best_dna = max(population, key=lambda dna: fitness(dna, k, rs))  # Use lambda to pass additional parameters
+    melody, chords = create_music(best_dna, k=k, rs=rs)
+    return best_dna, melody, chords, best_scores
 
 def main():
     # Build argument parser
@@ -14,13 +256,23 @@ def main():
     parser.add_argument('-m', '--midi', help='shows score in midi format', action='store_true')
     parser.add_argument('-s', '--sheet_music', help='shows score as sheet music', action='store_true')
     parser.add_argument('-t', '--text', help='shows score as text', action='store_true')
-    parser.add_argument('-p', '--population_size', type=int, default=20, help='population size for genetic algorithm')
-    parser.add_argument('-g', '--generations', type=int, default=50, help='number of generations for genetic algorithm')
-    parser.add_argument('-mr', '--mutation_rate', type=float, default=0.01, help='mutation rate for genetic algorithm')
-    parser.add_argument('-cr', '--crossover_rate', type=float, default=0.7, help='crossover rate for genetic algorithm')
+    parser.add_argument('-p', '--population_size', type=int, default=POPULATION_SIZE, help='population size for genetic algorithm')
+    parser.add_argument('-g', '--generations', type=int, default=GENERATIONS, help='number of generations for genetic algorithm')
+    parser.add_argument('-mr', '--mutation_rate', type=float, default=MUTATION_RATE, help='mutation rate for genetic algorithm')
+    parser.add_argument('-cr', '--crossover_rate', type=float, default=CROSSOVER_RATE, help='crossover rate for genetic algorithm')
+    parser.add_argument('-e', '--elites', type=int, default=ELITES, help='number of top individuals kept unchanged each generation')
+    parser.add_argument('-sel', '--parents', type=int, default=PARENTS, help='number of top individuals parents are selected from')
+    parser.add_argument('-mk', '--multi_key', type=str, nargs='*', help='compose once and write the song in each of these keys (all 12 if none given)')
+    parser.add_argument('-tl', '--telemetry', type=str, help='filename of .jsonl file where per-generation GA statistics are written')
+    parser.add_argument('-o', '--output_dir', type=str, default='output', help='directory where multi-key scores are written')
     
     # Parse arguments, set up program
     args = parser.parse_args()
+    # Genetic algorithm selection sizes
+    if args.population_size < 2 or args.elites < 0 or args.elites > args.population_size or args.parents < 1:
+        print(f'Invalid genetic algorithm settings: population size must be at least 2, elites between 0 and '
+              f'the population size, and parents at least 1 (got p={args.population_size} e={args.elites} sel={args.parents})')
+        return
     # Random Seed
     if args.random_seed:
         if args.random_seed == -1:
@@ -38,13 +290,30 @@ def main():
     k = key.Key('C')
     key_set_flag = False
     if args.key:
-        for letter in ['A', 'Bb', 'B', 'C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab']:
+        for letter in KEYS:
             if args.key == letter:
                 k = key.Key(letter)
                 print(f'Key set to {letter}')
                 key_set_flag = True
         if not key_set_flag:
             print(f'Key provided is invalid. Key set to default: C')
+
+    # Multi-key mode
+    multi_keys = []
+    if args.multi_key is not None:
+        if len(args.multi_key) == 0:
+            multi_keys = list(KEYS)
+        for letter in args.multi_key:
+            if letter in KEYS and letter not in multi_keys:
+                multi_keys.append(letter)
+            elif letter not in KEYS:
+                print(f'Key provided is invalid, skipping: {letter}')
+        if not multi_keys:
+            print(f'No valid keys provided. Key set to default: C')
+            multi_keys = ['C']
+        # Compose once in C and transpose the winner into each key afterwards
+        k = key.Key('C')
+        print(f'Multi-key mode: {", ".join(multi_keys)}')
     
     # Filename
     if args.filename:
@@ -72,248 +341,63 @@ def main():
     for _,cL in AMINO_ACID_TO_CHORD.items():
         chordList.add(cL[0])
         
-    chordTypes = {
-        'tonic': [
-            'vi', 'vi7', 'iii', 'iii7', 'I[add6]', 'I', 'I[add9]', 'Imaj7'
-        ],
-        'subdominant': [
-            'ii7', 'IV[add9]', 'IV', 'IVmaj7', 'ii'
-        ],
-        'dominant': [
-            'V7#5', 'V7', 'vii°', 'V', 'vii°7', 'V7/iii', 'V[add6]'
-        ],
-        'Rest': ['Rest']
-    }
-    
-    rewardMap = {
-        ('tonic', 'tonic'): 1,
-        ('tonic', 'subdominant'): 6,
-        ('tonic', 'dominant'): 3,
-        ('subdominant', 'tonic'): 2,
-        ('subdominant', 'subdominant'): 4,
-        ('subdominant', 'dominant'): 4,
-        ('dominant', 'tonic'): 8,
-        ('dominant', 'subdominant'): 0,
-        ('dominant', 'dominant'): 2
-    }
-    
-    # DNA bases
-    BASES = ['a', 't', 'g', 'c']
-
-    # Genetic Algorithm Hyperparameters
-    POPULATION_SIZE = args.population_size
-    GENERATIONS = args.generations
-    MUTATION_RATE = args.mutation_rate
-    CROSSOVER_RATE = args.crossover_rate
-
-    chord2Function = {}
-    for fun, cL in chordTypes.items():
-        for c in cL:
-            chord2Function[c] = fun
-            
     originalSeq = ''
     with open(filename) as f_in:
             for line in f_in:
                 originalSeq += line.strip()
 
-    def create_music(DNASeq, k = key.Key('C'), rs = 42):
-        ## Commenting out irrelevant argparse stuff
-        random.seed = rs
-        # k = key.Key('C')
-        
-        # Set up the score
-        # score = stream.Score()
+    # Helper: realize roman numerals as a bass clef part in key k
+    def realize_chords(roman_chords, k):
         chords = stream.Part()
         chords.append(clef.BassClef())
-        melody = stream.Part()
-        melody.append(clef.TrebleClef())
-
-        # Add time signature and key information to the score
         time_signature = meter.TimeSignature('4/4')
         chords.append(time_signature)
-        melody.append(time_signature)
         chords.append(k)
-        melody.append(k)
 
-        nucleotides = ''
-        
-        ##### GET NUCLEOTIDES FROM INPUT
-        for char in DNASeq:
-            nucleotides += char
-        
-        
-        # Add chords to the first part object
-        key_list = []
-        curr_codon = ''
-        roman_chords = []
-        for n in nucleotides:
-            # Transcription
-            if n.lower() == 't':
-                n = 'u'
-            curr_codon += n.lower()
-            # If codon is size 3, translate into amino acid
-            if len(curr_codon) % 3 == 0:
-                # Translation
-                amino_acid = get_mapping_output(TRANSLATION, curr_codon.lower())
-                curr_chord = get_mapping_output(AMINO_ACID_TO_CHORD, amino_acid, chords, k, key_list)
-                roman_chords.append(curr_chord)
-                # get_mapping_output(AMINO_ACID_TO_CHORD, 'R', chords, k, key_list)
-                curr_codon = ''
-
-        # Calculate the time in quarter notes occupied by the chords
-        chord_length = 0
-        for chord in chords.notes:
-            chord_length += chord.duration.quarterLength
-            
-        chords = chords.transpose(-12)
-
-        flag = False
-        current_chord_idx = 0
-        melody_length = 0
-        measure_pos = 0
-        rhythm_idx = 0
-        
-        rhythmList = generate_bird_rhythm(chord_length)
-        rhythmList = [r for r in rhythmList if r > 0]
-        
-        if sum(rhythmList) < chord_length:
-            rhythmList.append(chord_length - sum(rhythmList))
-        
-        # Add a melody based on the DNA sequence and shaped by the protein-based chord sequence.
-        while not flag:
-            # Continue while the melody is not longer than the chords
-            if melody_length >= (chord_length-1e-4):
-                flag = True
-                break
-            # Iterate through the pitches in the DNA
-            for n in nucleotides:
-                # print(current_chord_idx, melody_length, measure_pos, rhythm_idx, rhythmList[rhythm_idx])
-                # Figure out chord tone using nucleotide
-                i = get_mapping_output(NUCLEOTIDE_TO_INDEX, n.lower())
-                # Get current chord
-                curr_chord = chords.notes[current_chord_idx]
-                
-                # TODO: Replace this part with the generative model
-                # Pick a note length randomly
-                quarter_length = rhythmList[rhythm_idx] # random.choices([0.25, 0.5, 1], weights=[.1, .5, .4])[0]
-                
-                # Add note to the melody
-                melody.append(note.Note(curr_chord.pitches[i % len(curr_chord.notes)], quarterLength=quarter_length).transpose(12))
-                
-                # Calculate location in the score and measure
-                measure_pos += quarter_length
-                melody_length += quarter_length
-                rhythm_idx += 1
-                if melody_length >= (chord_length-1e-4):
-                    flag = True
-                    break
-                if measure_pos >= 4:
-                    current_chord_idx += 1
-                    measure_pos -= 4
-        
-        return melody, roman_chords
-
-    def reward(melody, chords, k):
-        count = 0
-        # melody smoothness evaluation
-        pastNote = None
-        for n in melody:
-            if not isinstance(n, note.Note): continue
-            if pastNote is None: pastNote = n.pitch.midi
+        for c in roman_chords:
+            if c == 'Rest': chords.append(note.Rest(length= 4.0))
             else:
-                count += 2 * (1 / (1 + abs(n.pitch.midi - pastNote)))
-                if n.pitch.midi == pastNote: count -= 2
-                pastNote = n.pitch.midi
-        
-        if n.pitch.midi in [i+k.pitches[0].midi for i in [0,4,7,12]]: count += 20
-        
-        # chord progression evaluation
-        pastChord = None
-        for c in chords:
-            if pastChord is None and c != 'Rest': pastChord = c
-            else:
-                if 'Rest' == c: continue
-                count += rewardMap[(chord2Function[pastChord], chord2Function[c])]
-                pastChord = c
-        if chord2Function[c] == 'tonic': count += 20
-        
-        
-        return count
-
-    # Helper: mutate a DNA string
-    def mutate(dna):
-        dna = list(dna)
-        for i in range(len(dna)):
-            if random.random() < MUTATION_RATE:
-                dna[i] = random.choice(BASES)
-        return ''.join(dna)
-
-    # Helper: crossover two parents
-    def crossover(parent1, parent2):
-        if random.random() > CROSSOVER_RATE:
-            return parent1, parent2
-        point = random.randint(1, len(parent1) - 1)
-        child1 = parent1[:point] + parent2[point:]
-        child2 = parent2[:point] + parent1[point:]
-        return child1, child2
-
-    # Helper: evaluate fitness
-    def fitness(dna, k, rs):
-        melody, chords = create_music(dna, k, rs)
-        return reward(melody, chords, k)
-
-    # Genetic Algorithm
-    def evolve_music(initial_dna, generations=GENERATIONS, k = key.Key('C'), rs = 42):
-        # Initial population
-        population = [mutate(initial_dna) for _ in range(POPULATION_SIZE)]
-        population[0] = initial_dna  # include the original sequence
-        best_scores = []
-        for gen in range(generations):
-            scored = [(dna, fitness(dna, k, rs)) for dna in population]
-            scored.sort(key=lambda x: x[1], reverse=True)  # highest reward first
-
-            print(f"Generation {gen+1}: Best score = {scored[0][1]}")
-            
-            best_scores.append(scored[0][1])
-            # Elitism: keep top 2
-            new_population = [scored[0][0], scored[1][0]]
+                chords.append(chord.Chord(roman.RomanNumeral(c, k), quarterLength = 4.0))
 
-            # Create next generation
-            while len(new_population) < POPULATION_SIZE:
-                parent1, parent2 = random.choices(scored[:10], k=2)  # select from top 10
-                child1, child2 = crossover(parent1[0], parent2[0])
-                new_population.extend([mutate(child1), mutate(child2)])
+        return chords.transpose(-12)
 
-            population = new_population[:POPULATION_SIZE]  # trim if overfilled
+    # Helper: combine melody and chords into a titled score
+    def build_score(melody, chords):
+        score = stream.Score()
+        score.insert(0, melody)
+        score.insert(0, chords)
+        score.insert(0, metadata.Metadata())
+        score.metadata.title = 'Genetically accurate bird music :)'
+        score.metadata.composer = 'Emily Ertle, Alberto Naveira, Dan Little'
+        return score
 
-        # Return the best DNA and its melody/chords
-        best_dna = max(population, key=lambda dna: fitness(dna, k, rs))  # Use lambda to pass additional parameters
-        melody, chords = create_music(best_dna, k=k, rs=rs)
-        return best_dna, melody, chords, best_scores
+    telemetry = TelemetrySink(args.telemetry) if args.telemetry else None
+    try:
+        best_dna, melody, roman_chords, best_scores = evolve_music(
+            originalSeq, args.generations, k=k, rs=rs, telemetry=telemetry,
+            population_size=args.population_size, mutation_rate=args.mutation_rate,
+            crossover_rate=args.crossover_rate, elites=args.elites, parents=args.parents)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
 
+    if multi_keys:
+        # Each key is the winner found in C shifted by a fixed interval. Some chords
+        # (e.g. V7/iii) may sit in a different octave than -k <key> would put them,
+        # and the result is not necessarily the best song the GA would find in that key.
+        chords = realize_chords(roman_chords, k)
+        os.makedirs(args.output_dir, exist_ok=True)
+        file_format = output_type if output_type else 'musicxml'
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        for letter in multi_keys:
+            offset = interval.Interval(k.pitches[0], key.Key(letter).pitches[0])
+            score = build_score(melody.transpose(offset), chords.transpose(offset))
+            path = os.path.join(args.output_dir, f'{stem}_{letter}.{OUTPUT_EXTENSIONS[file_format]}')
+            score.write(file_format, fp=path)
+            print(f'Wrote {letter} to {path}')
+        return
 
-    best_dna, melody, roman_chords, best_scores = evolve_music(originalSeq, k=k, rs=rs)
-
-    #k = key.Key('C')
-    score = stream.Score()
-    chords = stream.Part()
-    chords.append(clef.BassClef())
-    time_signature = meter.TimeSignature('4/4')
-    chords.append(time_signature)
-    chords.append(k)
-
-    for c in roman_chords:
-        if c == 'Rest': chords.append(note.Rest(length= 4.0))
-        else:
-            chords.append(chord.Chord(roman.RomanNumeral(c, k), quarterLength = 4.0))
-
-    chords = chords.transpose(-12)
-
-    score.insert(0, melody)
-    score.insert(0, chords)
-    score.insert(0, metadata.Metadata())
-    score.metadata.title = 'Genetically accurate bird music :)'
-    score.metadata.composer = 'Emily Ertle, Alberto Naveira, Dan Little'
+    score = build_score(melody, realize_chords(roman_chords, k))
 
     # Play midi, output sheet music, or print the contents of the stream
     if output_type == '':
@@ -0,0 +1,169 @@
+import argparse
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from music21 import key
+from project import (KEYS, POPULATION_SIZE, GENERATIONS, MUTATION_RATE, CROSSOVER_RATE, ELITES, PARENTS,
+                     initial_population, evolve_population)
+
+def parse_values(values, cast):
+    """
+    Expand command line values into a list. Each value is either a single number or a start:stop:step range (stop included).
+    Raises ValueError for a malformed value or a range whose step is not positive
+    """
+    result = []
+    for value in values:
+        if ':' in value:
+            fields = value.split(':')
+            if len(fields) != 3:
+                raise ValueError(f'range must be start:stop:step, got {value}')
+            start, stop, step = (cast(v) for v in fields)
+            if step <= 0:
+                raise ValueError(f'range step must be positive, got {value}')
+            current = start
+            while current <= stop + 1e-9:
+                result.append(round(current, 10) if cast is float else current)
+                current += step
+        else:
+            result.append(cast(value))
+    return result
+
+def seed_rng(seed):
+    """
+    Seed the global random module. create_music assigns to random.seed, so random.seed() cannot be called here
+    """
+    random.setstate(random.Random(seed).getstate())
+
+def start_trial(config, seed, dna):
+    """
+    Build the starting state of one (configuration, seed) run
+    """
+    seed_rng(seed)
+    population = initial_population(dna, config['population_size'], config['mutation_rate'])
+    return {'config': config, 'seed': seed, 'population': population,
+            'rng_state': random.getstate(), 'best_scores': []}
+
+def run_trial(trial, generations, k_name):
+    """
+    Resume one run for more generations. Executed in a worker process
+    """
+    config = trial['config']
+    random.setstate(trial['rng_state'])
+    population, best_scores = evolve_population(
+        trial['population'], generations, key.Key(k_name), trial['seed'],
+        config['mutation_rate'], config['crossover_rate'], config['elites'], config['parents'],
+        start_gen=len(trial['best_scores']), verbose=False)
+    trial['population'] = population
+    trial['rng_state'] = random.getstate()
+    trial['best_scores'] = trial['best_scores'] + best_scores
+    return trial
+
+def config_score(trials):
+    """
+    Mean over seeds of the best score each run has reached so far
+    """
+    return sum(max(t['best_scores']) for t in trials) / len(trials)
+
+def successive_halving(configs, seeds, dna, k_name, min_generations, max_generations, eta, workers):
+    """
+    Run every configuration for min_generations, keep the best 1/eta, then give the survivors eta times
+    as many generations, until max_generations is reached. Returns (config, score, generations) rows, best first
+    """
+    trials = {i: [start_trial(config, seed, dna) for seed in seeds] for i, config in enumerate(configs)}
+    results = {}
+    alive = list(trials)
+    done = 0
+    budget = min(min_generations, max_generations)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while alive:
+            jobs = [(i, j, pool.submit(run_trial, trial, budget - done, k_name))
+                    for i in alive for j, trial in enumerate(trials[i])]
+            for i, j, job in jobs:
+                trials[i][j] = job.result()
+            for i in alive:
+                results[i] = (configs[i], config_score(trials[i]), budget)
+            ranked = sorted(alive, key=lambda i: results[i][1], reverse=True)
+            print(f'{budget} generations: {len(alive)} configurations, best = {results[ranked[0]][1]}')
+            if budget >= max_generations:
+                break
+            alive = ranked[:max(1, len(ranked) // eta)]
+            done = budget
+            budget = min(budget * eta, max_generations)
+    # Configurations that went further rank above those pruned earlier
+    return sorted(results.values(), key=lambda r: (r[2], r[1]), reverse=True)
+
+def main():
+    # Build argument parser
+    parser = argparse.ArgumentParser(description='hyperparameter sweep for the genetic algorithm in project.py')
+    parser.add_argument('-f', '--filename', type=str, default='SLIT1.txt', help='filename of .txt file where DNA is stored')
+    parser.add_argument('-k', '--key', type=str, default='C', help='key to generate the song in')
+    parser.add_argument('-p', '--population_size', type=str, nargs='+', default=[str(POPULATION_SIZE)], help='population sizes to try (values or start:stop:step)')
+    parser.add_argument('-mr', '--mutation_rate', type=str, nargs='+', default=[str(MUTATION_RATE)], help='mutation rates to try (values or start:stop:step)')
+    parser.add_argument('-cr', '--crossover_rate', type=str, nargs='+', default=[str(CROSSOVER_RATE)], help='crossover rates to try (values or start:stop:step)')
+    parser.add_argument('-e', '--elites', type=str, nargs='+', default=[str(ELITES)], help='elite counts to try (values or start:stop:step)')
+    parser.add_argument('-sel', '--parents', type=str, nargs='+', default=[str(PARENTS)], help='parent selection sizes to try (values or start:stop:step)')
+    parser.add_argument('-rs', '--random_seeds', type=int, nargs='+', default=[42], help='random seeds each configuration is run with')
+    parser.add_argument('-g', '--generations', type=int, default=GENERATIONS, help='generations given to the final surviving configurations')
+    parser.add_argument('-mg', '--min_generations', type=int, default=5, help='generations given to every configuration in the first round')
+    parser.add_argument('-eta', '--eta', type=int, default=3, help='keep the best 1/eta configurations each round')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-o', '--output', type=str, help='filename of .csv file where the ranked results are written')
+    args = parser.parse_args()
+
+    if args.key not in KEYS:
+        print(f'Key provided is invalid. Key set to default: C')
+        args.key = 'C'
+    if args.eta < 2:
+        parser.error('eta must be at least 2')
+    if args.min_generations < 1:
+        parser.error('min_generations must be at least 1')
+    if args.generations < 1:
+        parser.error('generations must be at least 1')
+    if args.workers < 1:
+        parser.error('workers must be at least 1')
+
+    originalSeq = ''
+    with open(args.filename) as f_in:
+        for line in f_in:
+            originalSeq += line.strip()
+
+    try:
+        grid = list(itertools.product(parse_values(args.population_size, int),
+                                      parse_values(args.mutation_rate, float),
+                                      parse_values(args.crossover_rate, float),
+                                      parse_values(args.elites, int),
+                                      parse_values(args.parents, int)))
+    except ValueError as err:
+        parser.error(str(err))
+
+    configs = []
+    for p, mr, cr, e, sel in grid:
+        # Elites fill the next generation, so there must be room for them and at least one parent
+        if e < 0 or e > p or sel < 1 or p < 2:
+            print(f'Skipping invalid configuration: p={p} e={e} sel={sel}')
+            continue
+        configs.append({'population_size': p, 'mutation_rate': mr, 'crossover_rate': cr,
+                        'elites': e, 'parents': sel})
+    if not configs:
+        parser.error('no valid configurations to run')
+    print(f'Sweeping {len(configs)} configurations x {len(args.random_seeds)} seeds')
+
+    results = successive_halving(configs, args.random_seeds, originalSeq, args.key,
+                                 args.min_generations, args.generations, args.eta, args.workers)
+
+    # Ranked results table
+    columns = ['population_size', 'mutation_rate', 'crossover_rate', 'elites', 'parents']
+    print(f"{'rank':>4} {'p':>5} {'mr':>8} {'cr':>6} {'e':>4} {'sel':>4} {'gens':>5} {'score':>10}")
+    for rank, (config, score, generations) in enumerate(results, 1):
+        print(f"{rank:>4} {config['population_size']:>5} {config['mutation_rate']:>8} {config['crossover_rate']:>6} "
+              f"{config['elites']:>4} {config['parents']:>4} {generations:>5} {score:>10.3f}")
+    if args.output:
+        with open(args.output, 'w') as f_out:
+            f_out.write(','.join(['rank'] + columns + ['generations', 'score']) + '\n')
+            for rank, (config, score, generations) in enumerate(results, 1):
+                f_out.write(','.join(str(v) for v in [rank] + [config[c] for c in columns] + [generations, score]) + '\n')
+        print(f'Results written to {args.output}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import time
+import numpy as np
+
+def population_diversity(population):
+    """
+    Mean pairwise Hamming distance and number of unique sequences in a population of equal length DNA strings
+    """
+    unique = len(set(dna.lower() for dna in population))
+    size = len(population)
+    if size < 2:
+        return 0.0, unique
+    # Count each base per position; pairs that differ at a position = (n^2 - sum(count^2)) / 2
+    codes = np.array([np.frombuffer(dna.lower().encode(), dtype=np.uint8) for dna in population])
+    counts = np.stack([(codes == ord(b)).sum(axis=0) for b in set(''.join(population).lower())])
+    differing_pairs = (size * size - (counts ** 2).sum(axis=0)) / 2
+    pairs = size * (size - 1) / 2
+    return float(differing_pairs.sum() / pairs), unique
+
+class TelemetrySink:
+    """
+    Collects one record per GA generation and sends it to a JSONL file and/or a callback.
+    File writes are buffered and only flushed every flush_every records and on close().
+    """
+    def __init__(self, filepath=None, callback=None, flush_every=10):
+        self.filepath = filepath
+        self.callback = callback
+        self.flush_every = flush_every
+        self.buffer = []
+        self.start_time = time.perf_counter()
+        self.records = 0
+        if filepath is not None:
+            # Start a fresh file for this run
+            open(filepath, 'w').close()
+
+    def record(self, generation, scores, population, evaluations, eval_seconds, cache_stats=None):
+        """
+        Build the record for one generation from its fitness scores and population.
+        eval_seconds is the time spent scoring the population only, not breeding it
+        """
+        now = time.perf_counter()
+        diversity, unique = population_diversity(population)
+        entry = {
+            'generation': generation,
+            'best': float(np.max(scores)),
+            'mean': float(np.mean(scores)),
+            'median': float(np.median(scores)),
+            'diversity': diversity,
+            'unique': unique,
+            'evaluations': evaluations,
+            'evals_per_sec': evaluations / eval_seconds if eval_seconds > 0 else None,
+            'elapsed': now - self.start_time,
+        }
+        if cache_stats is not None:
+            entry['cache'] = cache_stats
+        self.emit(entry)
+        return entry
+
+    def emit(self, entry):
+        self.records += 1
+        if self.callback is not None:
+            self.callback(entry)
+        if self.filepath is not None:
+            self.buffer.append(json.dumps(entry))
+            if len(self.buffer) >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        if self.filepath is None or not self.buffer:
+            return
+        with open(self.filepath, 'a') as f_out:
+            f_out.write('\n'.join(self.buffer) + '\n')
+        self.buffer = []
+
+    def close(self):
+        self.flush()